@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""Validation of the estimated expressed gene counts across all collections.
+
+Every collection folder below ``results/`` holds the ``estimates.txt`` written
+by the validation step of ``singular_analysis.Rmd`` / ``droplet_based_analysis.Rmd``
+(one block with its own header line per cell type) and the summary
+``RMSE_deviation_results.txt``. All collections are loaded into one frame and
+summarized with grouped operations over any combination of collection, run,
+threshold, subsample and cell type.
+
+Per collection only additive statistics are kept (counts, sums of errors,
+deviations and of the products needed for the pooled R squared), so adding,
+replacing or reloading a single collection does not touch the others and every
+summary is a groupby over these statistics.
+
+    python validation.py --by collection sample
+    python validation.py --by sample cell.type --csv summary.csv
+    python validation.py --check
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "results")
+ESTIMATES_FILE = "estimates.txt"
+RMSE_FILE = "RMSE_deviation_results.txt"
+
+LABEL_COLUMNS = ["run", "dataset", "threshold", "evaluation", "cell.type", "sample"]
+NUMERIC_COLUMNS = ["num.cells", "meanUMI", "expressed.genes", "estimated.counts", "rsq", "deviation"]
+KEY_COLUMNS = ["collection", "run", "dataset", "threshold", "evaluation", "sample", "cell.type"]
+SAMPLES = ["complete", "subsampled75", "subsampled50", "subsampled25"]
+
+# Additive statistics of a group, every summary metric is derived from these
+STAT_COLUMNS = ["n", "abs_error", "sq_error", "deviation", "rsq", "num.cells", "meanUMI",
+                "x", "y", "xx", "yy", "xy"]
+
+
+def discover_collections(results_dir=RESULTS_DIR):
+    # "prostate/Small Dataset/poscounts" -> .../prostate/Small Dataset/poscounts/estimates.txt
+    collections = {}
+    for root, _, files in os.walk(results_dir):
+        if ESTIMATES_FILE in files:
+            name = os.path.relpath(root, results_dir).replace(os.sep, "/")
+            collections[name] = os.path.join(root, ESTIMATES_FILE)
+    return dict(sorted(collections.items()))
+
+def read_estimates(path, collection):
+    df = pd.read_csv(path, sep=" ", dtype=str, skip_blank_lines=True)
+    # Every cell type block repeats the header line
+    df = df[df["run"] != "run"]
+    df[NUMERIC_COLUMNS] = df[NUMERIC_COLUMNS].apply(pd.to_numeric, errors="coerce")
+    df.insert(0, "collection", collection)
+    return df.reset_index(drop=True)
+
+def read_rmse_results(path):
+    # Appended runs leave further header lines behind, the first row holds the values
+    return pd.read_csv(path, sep=" ", dtype=str, skip_blank_lines=True).iloc[0].astype(float)
+
+def collection_statistics(df):
+    df = df.dropna(subset=["expressed.genes", "estimated.counts"])
+    observed = df["expressed.genes"].to_numpy(dtype=float)
+    estimated = df["estimated.counts"].to_numpy(dtype=float)
+    error = estimated - observed
+
+    stats = pd.DataFrame({
+        "n": 1,
+        "abs_error": np.abs(error),
+        "sq_error": error ** 2,
+        "deviation": df["deviation"].to_numpy(dtype=float),
+        "rsq": df["rsq"].to_numpy(dtype=float),
+        "num.cells": df["num.cells"].to_numpy(dtype=float),
+        "meanUMI": df["meanUMI"].to_numpy(dtype=float),
+        "x": estimated, "y": observed,
+        "xx": estimated ** 2, "yy": observed ** 2, "xy": estimated * observed,
+    }, index=df.index)
+    keys = df[KEY_COLUMNS].fillna("")
+    return pd.concat([keys, stats], axis=1).groupby(KEY_COLUMNS, sort=False, as_index=False)[STAT_COLUMNS].sum()
+
+def summarize_statistics(stats, by):
+    grouped = stats.groupby(list(by), sort=True)[STAT_COLUMNS].sum() if by else stats[STAT_COLUMNS].sum().to_frame().T
+    n = grouped["n"]
+
+    # Pooled R squared of estimated against observed counts over all rows of the group
+    cov = grouped["xy"] - grouped["x"] * grouped["y"] / n
+    var_x = grouped["xx"] - grouped["x"] ** 2 / n
+    var_y = grouped["yy"] - grouped["y"] ** 2 / n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pooled_rsq = cov ** 2 / (var_x * var_y)
+
+    return pd.DataFrame({
+        "n": n.astype(int),
+        "rmse": np.sqrt(grouped["sq_error"] / n),
+        "mean_abs_error": grouped["abs_error"] / n,
+        "mean_deviation": grouped["deviation"] / n,
+        "mean_rsq": grouped["rsq"] / n,
+        "pooled_rsq": pooled_rsq.where(np.isfinite(pooled_rsq)),
+        "mean_num_cells": grouped["num.cells"] / n,
+        "mean_meanUMI": grouped["meanUMI"] / n,
+    }, index=grouped.index)
+
+
+class ValidationEngine:
+    def __init__(self):
+        self._estimates = {}
+        self._statistics = {}
+        self._sources = {}
+        self._combined = None
+
+    @classmethod
+    def from_results(cls, results_dir=RESULTS_DIR):
+        engine = cls()
+        engine.refresh(results_dir)
+        return engine
+
+    @property
+    def collections(self):
+        return list(self._statistics)
+
+    def add_collection(self, collection, estimates):
+        # Replaces the collection if it is already loaded
+        self._estimates[collection] = estimates
+        self._statistics[collection] = collection_statistics(estimates)
+        self._combined = None
+
+    def remove_collection(self, collection):
+        self._estimates.pop(collection, None)
+        self._statistics.pop(collection, None)
+        self._sources.pop(collection, None)
+        self._combined = None
+
+    def load_collection(self, collection, path):
+        status = os.stat(path)
+        self.add_collection(collection, read_estimates(path, collection))
+        self._sources[collection] = (path, status.st_mtime_ns, status.st_size)
+
+    def refresh(self, results_dir=RESULTS_DIR):
+        # Only new or modified estimates files are read again
+        found = discover_collections(results_dir)
+        for collection in set(self._sources) - set(found):
+            self.remove_collection(collection)
+
+        changed = []
+        for collection, path in found.items():
+            status = os.stat(path)
+            if self._sources.get(collection) != (path, status.st_mtime_ns, status.st_size):
+                self.load_collection(collection, path)
+                changed.append(collection)
+        if changed:
+            logging.info(f"Reloaded {len(changed)} collection(s): {', '.join(changed)}")
+        return changed
+
+    def estimates(self, collection=None):
+        if collection is not None:
+            return self._estimates[collection]
+        if not self._estimates:
+            return pd.DataFrame(columns=["collection"] + LABEL_COLUMNS + NUMERIC_COLUMNS)
+        return pd.concat(self._estimates.values(), ignore_index=True)
+
+    def statistics(self):
+        if self._combined is None:
+            if self._statistics:
+                self._combined = pd.concat(self._statistics.values(), ignore_index=True)
+            else:
+                self._combined = pd.DataFrame(columns=KEY_COLUMNS + STAT_COLUMNS)
+        return self._combined
+
+    def summarize(self, by=("collection", "sample")):
+        return summarize_statistics(self.statistics(), by)
+
+    def legacy_summary(self):
+        # Same layout as RMSE_deviation_results.txt: the "mean RMSE" of the Rmd code is the
+        # mean absolute error of the single estimates of a subsample
+        summary = self.summarize(["collection", "sample"])
+        legacy = summary["mean_abs_error"].unstack("sample").reindex(columns=SAMPLES)
+        legacy.columns = [f"mean_RMSE_{sample}" for sample in legacy.columns]
+        legacy["overall_mean_deviation"] = self.summarize(["collection"])["mean_deviation"]
+        return legacy
+
+    def check(self, results_dir=RESULTS_DIR, rtol=1e-6):
+        # Recomputed summaries against the RMSE_deviation_results.txt files next to the estimates
+        legacy = self.legacy_summary()
+        rows = []
+        for collection in legacy.index:
+            path = os.path.join(results_dir, collection, RMSE_FILE)
+            if not os.path.exists(path):
+                continue
+            recorded = read_rmse_results(path)
+            for metric, value in recorded.items():
+                computed = legacy.loc[collection].get(metric, np.nan)
+                rows.append({
+                    "collection": collection, "metric": metric, "recorded": value, "computed": computed,
+                    "match": bool(np.isclose(computed, value, rtol=rtol)),
+                })
+        return pd.DataFrame(rows, columns=["collection", "metric", "recorded", "computed", "match"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the estimated gene count validation of all collections.")
+    parser.add_argument("--results", default=RESULTS_DIR, help="Folder with one subfolder per collection")
+    parser.add_argument("--by", nargs="*", default=["collection", "sample"], choices=KEY_COLUMNS,
+                        help="Columns to group by (none for a single overall summary)")
+    parser.add_argument("--csv", help="Write the summary to this file instead of printing it")
+    parser.add_argument("--check", action="store_true",
+                        help="Compare the recomputed summaries with the RMSE_deviation_results.txt files")
+    args = parser.parse_args()
+
+    engine = ValidationEngine.from_results(args.results)
+    if not engine.collections:
+        parser.error(f"No {ESTIMATES_FILE} found below '{args.results}'.")
+
+    if args.check:
+        report = engine.check(args.results)
+        print(report.to_string(index=False))
+        if not report["match"].all():
+            raise SystemExit(1)
+        return
+
+    summary = engine.summarize(args.by)
+    if args.csv:
+        summary.to_csv(args.csv)
+    else:
+        with pd.option_context("display.max_rows", None, "display.width", None):
+            print(summary)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import logging
+import json
+import tempfile
+import os
+import struct
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+COLLECTOR_SCRIPT = 'scpower_collector.R'
+
+# Parameters of scpower_collector.R, as built by the analysis page
+REQUIRED_ARGS = [
+    "totalBudget", "type", "ct", "ct.freq", "costKit", "costFlowCell", "readsPerFlowcell",
+    "ref.study.name", "cellsPerLane", "nSamplesRange", "nCellsRange", "readDepthRange",
+    "mappingEfficiency", "multipletRate", "multipletFactor", "min.UMI.counts", "perc.indiv.expr",
+    "samplingMethod", "sign.threshold", "MTmethod", "useSimulatedPower", "speedPowerCalc",
+    "indepSNPs", "ssize.ratio.de", "reactionsPerKit",
+]
+
+
+# Columnar result file written by scpower_collector.R when it is given an output
+# path: magic, header length (uint32), JSON header with the row count and the
+# type and offset of every column, then one 8-byte aligned buffer per column.
+# Set SCPOWER_RESULT_FORMAT=json to receive the result as JSON on stdout instead.
+COLUMNAR_MAGIC = b"SCPCOL01"
+COLUMNAR_PREFIX = struct.Struct("<8sI")
+COLUMNAR_DTYPES = {"float64": "<f8", "int32": "<i4", "bool": "<i4", "category": "<i4"}
+INT32_NA = np.iinfo(np.int32).min
+RESULT_FORMAT = os.environ.get("SCPOWER_RESULT_FORMAT", "columnar")
+
+
+class CollectorError(Exception):
+    pass
+
+
+def validate_args(args):
+    if not isinstance(args, dict):
+        raise ValueError("The analysis parameters must be a JSON object.")
+    missing = [key for key in REQUIRED_ARGS if key not in args]
+    if missing:
+        raise ValueError(f"Missing analysis parameters: {', '.join(missing)}")
+
+def read_columnar(path):
+    # One writable buffer for the whole file, the columns are views into it
+    with open(path, 'rb') as file:
+        buffer = bytearray(os.fstat(file.fileno()).st_size)
+        file.readinto(buffer)
+
+    magic, header_length = COLUMNAR_PREFIX.unpack_from(buffer)
+    if magic != COLUMNAR_MAGIC:
+        raise ValueError(f"'{path}' is not a columnar collector result.")
+    start = COLUMNAR_PREFIX.size + header_length
+    header = json.loads(bytes(buffer[COLUMNAR_PREFIX.size:start]))
+    rows = header["rows"]
+
+    columns = {}
+    for column in header["columns"]:
+        values = np.frombuffer(buffer, dtype=COLUMNAR_DTYPES[column["type"]], count=rows, offset=start + column["offset"])
+        if column["type"] == "category":
+            codes = np.where(values == INT32_NA, -1, values)
+            columns[column["name"]] = pd.Categorical.from_codes(codes, categories=column["categories"])
+        elif column["type"] == "float64":
+            columns[column["name"]] = values
+        else:
+            # R integers and logicals mark missing values with the smallest int32
+            mask = values == INT32_NA
+            if column["type"] == "bool":
+                columns[column["name"]] = pd.arrays.BooleanArray(values.astype(bool), mask) if mask.any() else values.astype(bool)
+            else:
+                columns[column["name"]] = pd.arrays.IntegerArray(values, mask) if mask.any() else values
+    return pd.DataFrame(columns, index=pd.RangeIndex(rows), copy=False)
+
+# Function to run one power analysis through a fresh R process, the result is
+# returned as a DataFrame with one row per study
+def run_collector(args):
+    args_json = json.dumps(args)
+
+    logging.debug(f"JSON string: {args_json}")
+
+    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json') as temp_file:
+        json.dump(args, temp_file)
+        temp_file_path = temp_file.name
+
+    command = ['Rscript', COLLECTOR_SCRIPT, temp_file_path]
+    result_path = None
+    if RESULT_FORMAT == "columnar":
+        # Asks for the columnar file, scripts that cannot write it answer with JSON on stdout
+        result_path = temp_file_path[:-len('.json')] + '.scpcol'
+        command.append(result_path)
+
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, cwd=APP_DIR)
+
+        logging.info(f"R script stdout: {result.stdout}")
+        if result.stderr:
+            logging.error(f"R script stderr: {result.stderr}")
+
+        if result.returncode != 0:
+            raise CollectorError(result.stdout.strip() or f"Rscript exited with status {result.returncode}")
+
+        if result_path is not None and os.path.exists(result_path) and os.path.getsize(result_path) > 0:
+            return read_columnar(result_path)
+        return pd.DataFrame(json.loads(result.stdout))
+    finally:
+        # Remove the temporary files
+        for path in (temp_file_path, result_path):
+            if path is not None and os.path.exists(path):
+                os.unlink(path)
@@ -0,0 +1,84 @@
+import math
+
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.subplots as sp
+
+# Grid axes of the "Parameter Grid" choices
+GRID_AXES = {
+    "samples - cells per sample": ("sampleSize", "totalCells"),
+    "samples - reads per cell": ("sampleSize", "readDepth"),
+    "cells per sample - reads per cell": ("totalCells", "readDepth"),
+}
+FACET_COLUMNS = 3
+# Every cell type is a full optimization in the same request, and one facet of the figure
+MAX_COMPARISON_CELLTYPES = 24
+
+
+# All cell types are evaluated in one collector run, batch entry i belongs to celltypes[i]
+def build_celltype_batch(celltypes):
+    return [{"ct": celltype} for celltype in celltypes]
+
+def celltype_label(celltype):
+    # "assay_tissue_cell type" -> "cell type"
+    return celltype.split('_', 2)[-1]
+
+# Returns the results labelled with their cell type and the cell types without
+# any result (failed in the collector or without any finite detection power)
+def combine_celltype_results(data, celltypes):
+    df = pd.DataFrame(data)
+    if 'Detection.power' not in df.columns:
+        return pd.DataFrame(columns=['batch', 'Detection.power', 'celltype']), list(celltypes)
+    df['Detection.power'] = pd.to_numeric(df['Detection.power'], errors='coerce')
+    df = df.dropna(subset=['Detection.power'])
+    df['celltype'] = df['batch'].map(dict(enumerate(celltypes)))
+    evaluated = set(df['batch'])
+    failed = [celltype for index, celltype in enumerate(celltypes) if index not in evaluated]
+    return df, failed
+
+def rank_celltypes(df):
+    # The achievable power of a cell type is its best design under the shared budget
+    optimal = df.loc[df.groupby('celltype')['Detection.power'].idxmax()]
+    optimal = optimal.sort_values('Detection.power', ascending=False)
+
+    ranking = pd.DataFrame({
+        "Rank": range(1, len(optimal) + 1),
+        "Cell type": optimal['celltype'].to_numpy(),
+        "Detection power": optimal['Detection.power'].to_numpy(),
+    })
+    for column, label in [('sampleSize', "Sample size"), ('totalCells', "Cells per individuum"), ('readDepth', "Read depth")]:
+        if column in optimal.columns:
+            ranking[label] = optimal[column].to_numpy()
+    return ranking
+
+def create_celltype_facet_plot(df, ranking, parameter_grid):
+    x_axis, y_axis = GRID_AXES[parameter_grid]
+    if df.empty or x_axis not in df.columns or y_axis not in df.columns:
+        return None
+
+    # Facets follow the ranking, so the most promising cell types come first
+    celltypes = list(ranking['Cell type'])
+    rows = math.ceil(len(celltypes) / FACET_COLUMNS)
+    fig = sp.make_subplots(rows=rows, cols=FACET_COLUMNS, shared_xaxes=True, shared_yaxes=True,
+                           subplot_titles=[celltype_label(celltype) for celltype in celltypes],
+                           vertical_spacing=min(0.1, 0.5 / rows))
+
+    for index, (celltype, df_plot) in enumerate(sorted(df.groupby('celltype'), key=lambda item: celltypes.index(item[0]))):
+        fig.add_trace(
+            go.Scatter(
+                x=df_plot[x_axis], y=df_plot[y_axis],
+                mode='markers', name=celltype_label(celltype), showlegend=False,
+                marker=dict(color=df_plot['Detection.power'], coloraxis="coloraxis", size=10),
+                hovertemplate=f"{x_axis}: %{{x}}<br>{y_axis}: %{{y}}<br>Detection power: %{{marker.color:.3f}}<extra>{celltype_label(celltype)}</extra>"
+            ),
+            row=index // FACET_COLUMNS + 1, col=index % FACET_COLUMNS + 1
+        )
+
+    fig.update_layout(
+        height=max(400, 250 * rows),
+        coloraxis=dict(colorscale='Viridis', cmin=0, cmax=1, colorbar=dict(title="Detection power"))
+    )
+    fig.update_xaxes(title_text=x_axis, row=rows)
+    fig.update_yaxes(title_text=y_axis, col=1)
+
+    return fig
@@ -0,0 +1,47 @@
+import streamlit as st
+import json
+import time
+
+
+# Function to set up Google Drive API client
+# The Google client libraries are heavy to import, so they are only loaded
+# the first time a Drive fetch is actually requested.
+def get_gdrive_service():
+    from googleapiclient.discovery import build
+    from google.oauth2 import service_account
+
+    creds = service_account.Credentials.from_service_account_file(
+        'scpower-cell-atlas-ea6689019916.json',
+        scopes=['https://www.googleapis.com/auth/drive.readonly']
+    )
+    return build('drive', 'v3', credentials=creds)
+
+# Function to fetch JSON from Google Drive
+def fetch_gdrive_json(file_id):
+    service = get_gdrive_service()
+    try:
+        file = service.files().get_media(fileId=file_id).execute()
+        file_name = service.files().get(fileId=file_id, fields="name").execute().get('name')
+        st.session_state.success_message.success(f"Successfully fetched *{file_name}*. Loading it...")
+        time.sleep(2) 
+        return json.loads(file.decode('utf-8'))
+    except Exception as e:
+        st.error(f"Error fetching file from Google Drive: {str(e)}")
+        return None
+
+def read_json_file(file_path):
+    try:
+        with open(file_path, 'r') as file:
+            content = file.read()
+        st.session_state.success_message.success("File successfully uploaded and validated as JSON...")
+        time.sleep(2)
+        return json.loads(content)
+    except FileNotFoundError:
+        st.error(f"The file '{file_path}' was not found.")
+        return None
+    except json.JSONDecodeError:
+        st.error("The uploaded file is not valid JSON.")
+        return None
+    except Exception as e:
+        st.error(f"An error occurred while reading the file: {str(e)}")
+        return None
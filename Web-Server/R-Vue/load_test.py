@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+"""Concurrent-session load test for the "Detect DE/eQTL Genes" page.
+
+Every simulated session drives the real page headlessly through Streamlit's
+AppTest: it opens the analysis page, picks a random but realistic parameter
+mix from the options offered by the widgets (reference study, cell type,
+study type, parameter grid, cell type frequency) and clicks "Run analysis".
+AppTest is not thread-safe, so every session runs in its own process; all
+sessions are warmed up first and then start together.
+
+By default the R collector is replaced by a local stub that sleeps for
+``--stub-latency`` seconds and returns a synthetic result grid; use
+``--collector r`` to run the real scpower_collector.R.
+
+    python load_test.py --sessions 8 --iterations 5 --collector stub
+
+Reported: throughput, p50/p95/p99 latency of the analysis run, memory per
+session (peak growth of the resident set size of a session process after its
+warm-up) and the peak and total number of subprocesses spawned by the sessions.
+A session whose process dies is reported as crashed, its runs count as failed.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+ANALYSIS_PAGE = "Detect DE/eQTL Genes"
+
+
+def stub_collector(latency):
+    def run_collector(args):
+        time.sleep(latency)
+        # Two of the three ranges are set, the third parameter follows from the budget
+        sample_range = args["nSamplesRange"] or [None]
+        cells_range = args["nCellsRange"] or [None]
+        read_range = args["readDepthRange"] or [None]
+        records = []
+        for sample_size in sample_range:
+            for cells in cells_range:
+                for read_depth in read_range:
+                    sample_size = sample_size or random.randint(10, 100)
+                    cells = cells or random.randint(1000, 10000)
+                    read_depth = read_depth or random.randint(10000, 1000000)
+                    exp_probs, power = random.random(), random.random()
+                    records.append({
+                        "name": args["ref.study.name"], "Detection.power": round(exp_probs * power, 4),
+                        "exp.probs": round(exp_probs, 4), "power": round(power, 4),
+                        "sampleSize": sample_size, "totalCells": cells, "usableCells": int(cells * 0.94),
+                        "multipletFraction": 0.06, "ctCells": int(cells * args["ct.freq"]),
+                        "readDepth": read_depth, "readDepthSinglet": read_depth * 0.95,
+                        "mappedReadDepth": read_depth * 0.76, "expressedGenes": random.randint(5000, 12000),
+                    })
+        return records
+    return run_collector
+
+def _widget(widgets, label):
+    return next(widget for widget in widgets if widget.label == label)
+
+def run_session(rng, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    at.session_state.page = ANALYSIS_PAGE
+    at.run()
+
+    # Parameter mix drawn from the options the page offers
+    _widget(at.radio, "Study type:").set_value(rng.choice(["de", "eqtl"]))
+    _widget(at.selectbox, "Reference Study").set_value(rng.choice(_widget(at.selectbox, "Reference Study").options[:-1]))
+    _widget(at.selectbox, "Cell Types").set_value(rng.choice(_widget(at.selectbox, "Cell Types").options))
+    _widget(at.selectbox, "Parameter Grid").set_value(rng.choice(_widget(at.selectbox, "Parameter Grid").options))
+    _widget(at.slider, "Cell Type Frequency").set_value(rng.choice([0.05, 0.1, 0.2, 0.3]))
+    at.run()
+
+    start = time.perf_counter()
+    _widget(at.button, "Run analysis").click().run()
+    latency = time.perf_counter() - start
+
+    failed = bool(at.exception) or bool(at.error)
+    return latency, failed
+
+def resident_memory():
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+def child_processes(pid):
+    # Descendants of pid, read from /proc (Linux only)
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                stat = file.read()
+        except OSError:
+            continue
+        parents[int(entry)] = int(stat.rsplit(")", 1)[1].split()[1])
+
+    children, frontier = set(), {pid}
+    while frontier:
+        frontier = {child for child, parent in parents.items() if parent in frontier} - children
+        children |= frontier
+    return children
+
+class SubprocessSampler(threading.Thread):
+    def __init__(self, roots, interval=0.05):
+        super().__init__(daemon=True)
+        self.roots = roots
+        self.interval = interval
+        self.peak = 0
+        self.seen = set()
+        self.stopped = threading.Event()
+
+    def run(self):
+        if not os.path.isdir("/proc"):
+            return
+        while not self.stopped.is_set():
+            children = set().union(*(child_processes(root) for root in self.roots))
+            self.peak = max(self.peak, len(children))
+            self.seen |= children
+            self.stopped.wait(self.interval)
+
+class MemorySampler(threading.Thread):
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = resident_memory()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, resident_memory())
+            self.stopped.wait(self.interval)
+
+def session_worker(index, iterations, collector, stub_latency, seed, timeout, start, results):
+    import analysis
+
+    if collector == "stub":
+        analysis.run_collector = stub_collector(stub_latency)
+
+    # Warm up imports and caches, so they are not attributed to the measured runs
+    rng = random.Random(seed + index)
+    try:
+        run_session(rng, timeout)
+    except Exception as e:
+        logging.error(f"Session {index} failed during warm-up: {e}")
+        results.put(("done", index, [(None, True)] * iterations, None))
+        return
+    logging.getLogger().setLevel(logging.WARNING)
+
+    baseline_memory = resident_memory()
+    memory = MemorySampler()
+    memory.start()
+    results.put(("ready", index))
+    start.wait()
+
+    outcomes = []
+    for _ in range(iterations):
+        try:
+            outcomes.append(run_session(rng, timeout))
+        except Exception as e:
+            logging.error(f"Session {index} failed: {e}")
+            outcomes.append((None, True))
+
+    memory.stopped.set()
+    memory.join()
+    results.put(("done", index, outcomes, memory.peak - baseline_memory))
+
+def wait_for_sessions(results, workers, messages, kinds, crashed):
+    # Collects messages until every session has sent one of the given kinds;
+    # sessions whose process exited without doing so are added to crashed
+    def waiting():
+        return [index for index in range(len(workers))
+                if index not in crashed and messages.get(index, ("",))[0] not in kinds]
+
+    while waiting():
+        exited = [index for index in waiting() if not workers[index].is_alive()]
+        try:
+            message = results.get(timeout=0.5)
+            messages[message[1]] = message
+        except queue.Empty:
+            # Processes that had exited before the poll flushed their messages already
+            crashed.update(index for index in exited if index in waiting())
+
+def run_load_test(sessions, iterations, collector="stub", stub_latency=0.5, seed=0, timeout=600):
+    context = multiprocessing.get_context("spawn")
+    start_event = context.Event()
+    results = context.Queue()
+
+    workers = [context.Process(target=session_worker, daemon=True,
+                               args=(index, iterations, collector, stub_latency, seed, timeout, start_event, results))
+               for index in range(sessions)]
+    for worker in workers:
+        worker.start()
+
+    # All sessions are warmed up before the measured runs start together
+    messages, crashed = {}, set()
+    wait_for_sessions(results, workers, messages, ("ready", "done"), crashed)
+    start_event.set()
+    start = time.perf_counter()
+    subprocesses = SubprocessSampler([worker.pid for worker in workers])
+    subprocesses.start()
+
+    wait_for_sessions(results, workers, messages, ("done",), crashed)
+    elapsed = time.perf_counter() - start
+
+    subprocesses.stopped.set()
+    subprocesses.join()
+    for worker in workers:
+        worker.join(timeout=5)
+
+    outcomes, memory = [], []
+    for index in range(sessions):
+        if index in crashed:
+            logging.error(f"Session {index} exited unexpectedly (exit code {workers[index].exitcode})")
+            outcomes.extend([(None, True)] * iterations)
+            continue
+        _, _, session_outcomes, session_memory = messages[index]
+        outcomes.extend(session_outcomes)
+        if session_memory is not None:
+            memory.append(session_memory)
+
+    latencies = np.array([latency for latency, failed in outcomes if not failed])
+    percentiles = np.percentile(latencies, [50, 95, 99]) if len(latencies) else [float('nan')] * 3
+    return {
+        "collector": collector,
+        "sessions": sessions,
+        "crashed_sessions": len(crashed),
+        "runs": len(outcomes),
+        "failed": sum(failed for _, failed in outcomes),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(latencies) / elapsed, 3),
+        "latency_p50_s": round(float(percentiles[0]), 3),
+        "latency_p95_s": round(float(percentiles[1]), 3),
+        "latency_p99_s": round(float(percentiles[2]), 3),
+        "memory_per_session_mb": round(float(np.mean(memory)) / 1024**2, 1) if memory else float('nan'),
+        "peak_subprocesses": subprocesses.peak,
+        "total_subprocesses": len(subprocesses.seen),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the analysis page.")
+    parser.add_argument("--sessions", type=int, default=4, help="Number of concurrent sessions")
+    parser.add_argument("--iterations", type=int, default=3, help="Analysis runs per session")
+    parser.add_argument("--collector", choices=["stub", "r"], default="stub")
+    parser.add_argument("--stub-latency", type=float, default=0.5, help="Seconds the stub collector takes per run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=600, help="Timeout of a single script run in seconds")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = run_load_test(args.sessions, args.iterations, args.collector, args.stub_latency, args.seed, args.timeout)
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:>24}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Server-side level-of-detail aggregation for large power result sets.
+
+Results are binned into a regular 2-D grid on the selected x/y axes. The
+finest grid has ``LOD_BASE_BINS`` bins per axis; every coarser level merges
+2x2 bins of the level below, giving a multi-resolution pyramid that is
+computed once per axis selection. ``aggregate_view`` then picks the finest
+level whose visible bins stay below ``LOD_MAX_CELLS``, so the payload sent
+to the browser is bounded regardless of the number of results.
+"""
+import numpy as np
+import pandas as pd
+
+# Above this number of results the scatter plot switches to aggregated bins
+LOD_POINT_THRESHOLD = 20000
+LOD_BASE_BINS = 512
+LOD_MIN_BINS = 8
+LOD_MAX_CELLS = 4096
+
+
+def _group_cells(ix, iy, bins, count, power_sum, power_max, size_sum):
+    keys, inverse = np.unique(ix * bins + iy, return_inverse=True)
+    grouped_max = np.full(len(keys), -np.inf)
+    np.maximum.at(grouped_max, inverse, power_max)
+    return {
+        "ix": keys // bins,
+        "iy": keys % bins,
+        "count": np.bincount(inverse, weights=count, minlength=len(keys)),
+        "power_sum": np.bincount(inverse, weights=power_sum, minlength=len(keys)),
+        "power_max": grouped_max,
+        "size_sum": np.bincount(inverse, weights=size_sum, minlength=len(keys)),
+    }
+
+def _axis_extent(values):
+    low, high = float(values.min()), float(values.max())
+    if high <= low:
+        high = low + 1.0
+    return low, high
+
+def _bin_index(values, extent, bins):
+    low, high = extent
+    index = np.floor((values - low) / (high - low) * bins).astype(np.int64)
+    return np.clip(index, 0, bins - 1)
+
+def build_lod_pyramid(df, x_axis, y_axis, size_axis, power_column='Detection.power', base_bins=LOD_BASE_BINS):
+    x = df[x_axis].to_numpy(dtype=float)
+    y = df[y_axis].to_numpy(dtype=float)
+    power = df[power_column].to_numpy(dtype=float)
+    size = df[size_axis].to_numpy(dtype=float)
+
+    x_extent, y_extent = _axis_extent(x), _axis_extent(y)
+    level = _group_cells(_bin_index(x, x_extent, base_bins), _bin_index(y, y_extent, base_bins), base_bins,
+                         np.ones(len(x)), power, power, size)
+
+    levels = [(base_bins, level)]
+    bins = base_bins
+    while bins > LOD_MIN_BINS:
+        bins //= 2
+        level = _group_cells(level["ix"] // 2, level["iy"] // 2, bins,
+                             level["count"], level["power_sum"], level["power_max"], level["size_sum"])
+        levels.append((bins, level))
+
+    return {"x_extent": x_extent, "y_extent": y_extent, "levels": levels}
+
+def _bin_centers(index, extent, bins):
+    low, high = extent
+    return low + (index + 0.5) * (high - low) / bins
+
+def _bins_overlapping(index, extent, bins, value_range):
+    # A bin is visible as soon as any part of it lies inside the range, so a
+    # range smaller than one bin still shows the bin holding its results
+    low, high = extent
+    width = (high - low) / bins
+    return (low + index * width <= max(value_range)) & (low + (index + 1) * width >= min(value_range))
+
+def aggregate_view(pyramid, x_range=None, y_range=None, max_cells=LOD_MAX_CELLS):
+    for bins, level in pyramid["levels"]:
+        x = _bin_centers(level["ix"], pyramid["x_extent"], bins)
+        y = _bin_centers(level["iy"], pyramid["y_extent"], bins)
+
+        visible = np.ones(len(x), dtype=bool)
+        if x_range is not None:
+            visible &= _bins_overlapping(level["ix"], pyramid["x_extent"], bins, x_range)
+        if y_range is not None:
+            visible &= _bins_overlapping(level["iy"], pyramid["y_extent"], bins, y_range)
+
+        # Levels are ordered from fine to coarse, the last one is always used
+        if visible.sum() <= max_cells or bins == pyramid["levels"][-1][0]:
+            count = level["count"][visible]
+            return pd.DataFrame({
+                "x": x[visible],
+                "y": y[visible],
+                "count": count.astype(np.int64),
+                "power_max": level["power_max"][visible],
+                "power_mean": level["power_sum"][visible] / count,
+                "size_mean": level["size_sum"][visible] / count,
+            }), bins
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+"""Local HTTP/JSON service for the scPower power analysis.
+
+Exposes the analysis behind the "Detect DE/eQTL Genes" page so pipelines and
+the Vue frontend can call it without a Streamlit session:
+
+    POST /analysis   body: the same parameter object the analysis page builds
+    GET  /health     worker and queue status
+
+Requests are handled with asyncio. Identical concurrent requests are
+coalesced into a single computation, and jobs go through a bounded queue
+that answers 503 when it is full. The computations run on persistent
+``scpower_collector.R --serve`` workers that keep the libraries and priors
+loaded between requests. Worker failures are answered with 500; a worker that
+breaks the line protocol or exceeds the job timeout is killed and restarted.
+
+Results are returned column-oriented (``{"rows": n, "columns": {...}}``) by
+default, or as one JSON object per line when ``application/x-ndjson`` is
+accepted. Responses are gzip-compressed when the client accepts it.
+
+    python power_service.py --port 8765 --workers 2 --queue-size 32 --job-timeout 1800
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+
+from collector import APP_DIR, COLLECTOR_SCRIPT, CollectorError, validate_args
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Results of large grids are sent as a single line by the R worker
+COLLECTOR_LINE_LIMIT = 512 * 1024**2
+MAX_BODY_SIZE = 1024**2
+# Seconds a worker may take for one analysis before it is considered hung and restarted
+DEFAULT_JOB_TIMEOUT = 1800
+# Responses smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# A warm R process running scpower_collector.R in worker mode
+class CollectorWorker:
+    def __init__(self):
+        self.process = None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            'Rscript', COLLECTOR_SCRIPT, '--serve',
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            cwd=APP_DIR, limit=COLLECTOR_LINE_LIMIT)
+
+    async def run(self, args, timeout=None):
+        if self.process is None or self.process.returncode is not None:
+            await self.start()
+
+        try:
+            line = await asyncio.wait_for(self.exchange(args), timeout)
+        except asyncio.TimeoutError:
+            await self.kill()
+            raise CollectorError(f"The R worker did not answer within {timeout} seconds.")
+        except (OSError, ValueError) as e:
+            # Broken pipe, or a line above COLLECTOR_LINE_LIMIT that leaves stdout out of sync
+            await self.kill()
+            raise CollectorError(f"Communication with the R worker failed: {e}")
+
+        if not line:
+            # The worker died, it is restarted on the next job
+            self.process = None
+            raise CollectorError("The R worker exited unexpectedly.")
+
+        try:
+            result = json.loads(line)
+        except ValueError as e:
+            await self.kill()
+            raise CollectorError(f"The R worker sent an invalid result: {e}")
+        if isinstance(result, dict) and "error" in result:
+            raise CollectorError(result["error"])
+        return result
+
+    async def exchange(self, args):
+        self.process.stdin.write(json.dumps(args).encode('utf-8') + b"\n")
+        await self.process.stdin.drain()
+        return await self.process.stdout.readline()
+
+    # After a protocol error the worker's output can no longer be trusted, it is
+    # replaced by a fresh one on the next job
+    async def kill(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+            await self.process.wait()
+        self.process = None
+
+    async def stop(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.stdin.close()
+            await self.process.wait()
+
+
+class PowerService:
+    def __init__(self, workers=2, queue_size=32, job_timeout=DEFAULT_JOB_TIMEOUT):
+        self.workers = [CollectorWorker() for _ in range(workers)]
+        self.job_timeout = job_timeout
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.pending = {}
+        self.tasks = []
+
+    async def start(self):
+        for worker in self.workers:
+            await worker.start()
+            self.tasks.append(asyncio.create_task(self.consume(worker)))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        for worker in self.workers:
+            await worker.stop()
+
+    async def consume(self, worker):
+        while True:
+            key, args, future = await self.queue.get()
+            try:
+                future.set_result(await worker.run(args, self.job_timeout))
+            except CollectorError as e:
+                future.set_exception(e)
+            except Exception as e:
+                # Anything else going wrong on the worker side is still a server error
+                logging.exception("Analysis job failed")
+                future.set_exception(CollectorError(f"The analysis failed: {e}"))
+            finally:
+                self.pending.pop(key, None)
+                self.queue.task_done()
+
+    async def analyse(self, args):
+        validate_args(args)
+
+        # Identical requests that are still queued or running share one future
+        key = json.dumps(args, sort_keys=True)
+        future = self.pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            try:
+                self.queue.put_nowait((key, args, future))
+            except asyncio.QueueFull:
+                raise HTTPError(503, "Too many queued analyses, please retry later.")
+            self.pending[key] = future
+
+        # shield: a disconnecting client must not cancel a coalesced computation
+        return await asyncio.shield(future)
+
+    def status(self):
+        return {
+            "status": "ok",
+            "workers": len(self.workers),
+            "queued": self.queue.qsize(),
+            "pending": len(self.pending),
+        }
+
+
+def to_columns(records):
+    columns = {}
+    for index, record in enumerate(records):
+        for name, value in record.items():
+            columns.setdefault(name, [None] * index).append(value)
+        # Pad columns that are missing in this record
+        for values in columns.values():
+            if len(values) <= index:
+                values.append(None)
+    return {"rows": len(records), "columns": columns}
+
+def encode_result(records, accept):
+    if "application/x-ndjson" in accept:
+        body = "".join(json.dumps(record) + "\n" for record in records)
+        return body.encode('utf-8'), "application/x-ndjson"
+    return json.dumps(to_columns(records)).encode('utf-8'), "application/json"
+
+async def read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, version = request_line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line.")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0) or 0)
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, "Request body too large.")
+    body = await reader.readexactly(length) if length else b""
+    return method, target.split("?", 1)[0], version, headers, body
+
+async def write_response(writer, status, body, content_type, headers, keep_alive):
+    extra = []
+    if len(body) >= GZIP_MIN_SIZE and "gzip" in headers.get("accept-encoding", ""):
+        body = gzip.compress(body, compresslevel=5)
+        extra.append("Content-Encoding: gzip")
+    if status == 503:
+        extra.append("Retry-After: 1")
+
+    head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"] + extra
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+
+async def handle_connection(service, reader, writer):
+    try:
+        while True:
+            headers = {}
+            keep_alive = False
+            try:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, version, headers, body = request
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                if path == "/health":
+                    status, payload, content_type = 200, json.dumps(service.status()).encode('utf-8'), "application/json"
+                elif path == "/analysis":
+                    if method != "POST":
+                        raise HTTPError(405, "Use POST to run an analysis.")
+                    try:
+                        args = json.loads(body)
+                    except ValueError:
+                        raise HTTPError(400, "The request body is not valid JSON.")
+                    records = await service.analyse(args)
+                    status = 200
+                    payload, content_type = encode_result(records, headers.get("accept", ""))
+                else:
+                    raise HTTPError(404, f"Unknown path '{path}'.")
+            except HTTPError as e:
+                status, payload, content_type = e.status, json.dumps({"error": str(e)}).encode('utf-8'), "application/json"
+            except ValueError as e:
+                status, payload, content_type = 400, json.dumps({"error": str(e)}).encode('utf-8'), "application/json"
+            except CollectorError as e:
+                status, payload, content_type = 500, json.dumps({"error": str(e)}).encode('utf-8'), "application/json"
+
+            await write_response(writer, status, payload, content_type, headers, keep_alive)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(host, port, workers, queue_size, job_timeout=DEFAULT_JOB_TIMEOUT):
+    service = PowerService(workers=workers, queue_size=queue_size, job_timeout=job_timeout)
+    await service.start()
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    logging.info(f"Power analysis service listening on http://{host}:{port} with {workers} R workers")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON service for the scPower power analysis.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2, help="Number of warm R workers")
+    parser.add_argument("--queue-size", type=int, default=32, help="Maximal number of queued analyses before requests are rejected")
+    parser.add_argument("--job-timeout", type=float, default=DEFAULT_JOB_TIMEOUT,
+                        help="Seconds after which a hung R worker is killed and the analysis fails")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue_size, args.job_timeout))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""Shared, read-only prior segment for multi-worker deployments.
+
+The priors in ``data/`` (ref.study, gamma.mixed.fits, disp.fun.param and
+read.umi.fit) are packed once into a single memory-mapped file. Every app
+process attaches to it with ``attach_prior_segment()``; the columns are numpy
+views on the shared pages, so the operating system keeps a single copy in
+memory no matter how many workers are running.
+
+Only the Python side of the app reads the segment; at the moment the analysis
+page takes its cell type list from it. The R collector does not use it and
+still loads the .RData files from ``data/`` in every Rscript and ``--serve``
+worker. The layout below is defined only in this module.
+
+Layout of the segment file:
+
+    header   magic, format version, generation, length of the table of contents
+    toc      JSON describing every table/column (dtype, offset, length, categories)
+    columns  raw column buffers, each aligned to 64 bytes
+
+New priors are published with ``build_prior_segment()``, which writes a
+temporary file next to the segment and swaps it in with ``os.replace``.
+Attached processes keep reading their old mapping and pick up the new
+generation on their next ``attach_prior_segment()`` call.
+
+    python prior_cache.py build [--data-dir data] [--segment data/priors.seg]
+    python prior_cache.py info [--segment data/priors.seg]
+"""
+import argparse
+import csv
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_SEGMENT_PATH = os.environ.get("SCPOWER_PRIOR_SEGMENT", os.path.join(DATA_DIR, "priors.seg"))
+
+MAGIC = b"SCPPRIOR"
+FORMAT_VERSION = 1
+# magic, format version, generation, toc length
+HEADER = struct.Struct("<8sIQQ")
+ALIGNMENT = 64
+
+PRIOR_TABLES = {
+    "ref.study": "df.ref.study.csv",
+    "gamma.mixed.fits": "df.gamma.mixed.fits.csv",
+    "disp.fun.param": "df.disp.fun.param.csv",
+    "read.umi.fit": "df.read.umi.fit.csv",
+}
+
+
+# Function to read one of the exported prior tables (one row per column, values as JSON)
+def read_prior_csv(file_path):
+    csv.field_size_limit(2**31 - 1)
+    columns = {}
+    with open(file_path, newline='') as file:
+        reader = csv.reader(file)
+        next(reader)  # "name","value" header
+        for name, value in reader:
+            value = json.loads(value)
+            columns[name] = value if isinstance(value, list) else [value]
+    return columns
+
+def _is_missing(value):
+    return value is None or value == "NA"
+
+def encode_column(values):
+    present = [v for v in values if not _is_missing(v)]
+
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        if len(present) == len(values) and all(isinstance(v, int) for v in present):
+            return np.asarray(values, dtype=np.int64), None
+        return np.asarray([np.nan if _is_missing(v) else v for v in values], dtype=np.float64), None
+
+    # Strings are stored as integer codes into a category list kept in the toc,
+    # in order of first appearance (-1 marks a missing value)
+    categories = list(dict.fromkeys(str(v) for v in present))
+    lookup = {category: code for code, category in enumerate(categories)}
+    codes = np.asarray([-1 if _is_missing(v) else lookup[str(v)] for v in values], dtype=np.int32)
+    return codes, categories
+
+def build_prior_segment(data_dir=DATA_DIR, segment_path=DEFAULT_SEGMENT_PATH, generation=None):
+    if generation is None:
+        generation = time.time_ns()
+
+    toc = {}
+    buffers = []
+    offset = 0
+    for table, file_name in PRIOR_TABLES.items():
+        toc[table] = {}
+        for name, values in read_prior_csv(os.path.join(data_dir, file_name)).items():
+            array, categories = encode_column(values)
+            offset += -offset % ALIGNMENT
+            toc[table][name] = {
+                "dtype": array.dtype.str,
+                "offset": offset,
+                "length": len(array),
+                "categories": categories,
+            }
+            buffers.append((offset, array.tobytes()))
+            offset += array.nbytes
+
+    toc_bytes = json.dumps(toc).encode('utf-8')
+    data_start = HEADER.size + len(toc_bytes)
+    data_start += -data_start % ALIGNMENT
+
+    # Write next to the target and swap it in atomically, so attached readers
+    # never observe a partially written segment
+    directory = os.path.dirname(os.path.abspath(segment_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, generation, len(toc_bytes)))
+            file.write(toc_bytes)
+            for column_offset, data in buffers:
+                file.seek(data_start + column_offset)
+                file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, segment_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    return generation
+
+
+class PriorSegment:
+    def __init__(self, segment_path=DEFAULT_SEGMENT_PATH):
+        self.path = segment_path
+        with open(segment_path, 'rb') as file:
+            self._inode = os.fstat(file.fileno()).st_ino
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, generation, toc_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"'{segment_path}' is not a prior segment.")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Prior segment format version {version} is not supported (expected {FORMAT_VERSION}).")
+
+        self.generation = generation
+        self.toc = json.loads(self._mmap[HEADER.size:HEADER.size + toc_length].decode('utf-8'))
+        self._data_start = HEADER.size + toc_length + (-(HEADER.size + toc_length) % ALIGNMENT)
+
+    def tables(self):
+        return list(self.toc)
+
+    # Zero-copy, read-only view on the shared pages
+    def column(self, table, name):
+        info = self.toc[table][name]
+        return np.frombuffer(self._mmap, dtype=np.dtype(info["dtype"]), count=info["length"],
+                             offset=self._data_start + info["offset"])
+
+    def categories(self, table, name):
+        return self.toc[table][name]["categories"]
+
+    def table(self, name):
+        return {column: self.column(name, column) for column in self.toc[name]}
+
+    def to_dataframe(self, name):
+        import pandas as pd
+
+        data = {}
+        for column, info in self.toc[name].items():
+            values = self.column(name, column)
+            if info["categories"] is not None:
+                values = pd.Categorical.from_codes(values, categories=info["categories"])
+            data[column] = values
+        return pd.DataFrame(data, copy=False)
+
+    def celltypes(self):
+        return self.categories("disp.fun.param", "ct")
+
+    # True once a newer segment has been published at the same path
+    def is_stale(self):
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return False
+
+
+_attached_segments = {}
+
+def attach_prior_segment(segment_path=DEFAULT_SEGMENT_PATH):
+    segment = _attached_segments.get(segment_path)
+    if segment is None or segment.is_stale():
+        # The previous mapping is not closed explicitly: views handed out
+        # earlier keep it alive until they are garbage collected
+        segment = PriorSegment(segment_path)
+        _attached_segments[segment_path] = segment
+    return segment
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the shared prior segment.")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--segment", default=DEFAULT_SEGMENT_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        generation = build_prior_segment(args.data_dir, args.segment)
+        print(f"Published prior segment '{args.segment}' (generation {generation})")
+
+    segment = PriorSegment(args.segment)
+    print(f"Generation: {segment.generation}, size: {os.path.getsize(args.segment)} bytes")
+    for table, columns in segment.toc.items():
+        described = [f"{name} [{info['dtype']}]" for name, info in columns.items()]
+        print(f"{table}: {', '.join(described)}")
+
+if __name__ == "__main__":
+    main()
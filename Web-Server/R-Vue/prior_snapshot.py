@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+"""Offline SQLite snapshot of the prior database.
+
+Builds the snapshot that ``offlineQuery`` in ``scPower_shiny/server.R`` used
+to assemble statement by statement from the SQL dumps of main_table,
+disp_fun_estimation_results and gamma_linear_fit_results. Rows are parsed
+from the INSERT statements and bulk-loaded with ``executemany`` in a single
+transaction. Comments are dropped and statements of a pg_dump that SQLite does
+not know (session settings, ownership, sequences) are skipped, every other
+statement that fails aborts the build. The key used to join the result tables to main_table (the
+primary key without its ``\\x`` prefix) is stored in an indexed ``join_key``
+column instead of being computed with SUBSTRING in every query.
+
+    python prior_snapshot.py build --snapshot priors.sqlite \\
+        --dump $MAIN_TABLE_SQLITE --dump $DISP_FUN_SQLITE --dump $GAMMA_LINEAR_FITS_SQLITE
+
+The analysis page reads the snapshot's cell types through ``SnapshotPool``.
+The priors themselves are read by the R side with ``snapshotQuery`` in
+``scPower_shiny/prior_snapshot.R``.
+"""
+import argparse
+import contextlib
+import logging
+import os
+import queue
+import re
+import sqlite3
+
+DEFAULT_SNAPSHOT_PATH = os.environ.get("PRIOR_SNAPSHOT_SQLITE", "")
+
+RESULT_TABLES = ["gamma_linear_fit_results", "disp_fun_estimation_results"]
+
+# Tokens of a dump: comments and psql meta-commands (dropped), string literals
+# (with E'...' escape strings), quoted identifiers, statement terminators and
+# everything else. Statements end at semicolons outside of the first four.
+TOKEN_RE = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/|(?m:^\\[^\n]*))
+  | (?P<literal>[Ee]'(?:[^'\\]|\\.|'')*'|'(?:[^']|'')*')
+  | (?P<identifier>"(?:[^"]|"")*")
+  | (?P<end>;)
+  | (?P<text>(?:[^;'"\-/Ee\\]|[Ee](?!')|-(?!-)|/(?!\*)|(?m:(?<!^)\\))+)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+SCHEMA_RE = re.compile(r'\bpublic\.')
+INSERT_RE = re.compile(r'^\s*INSERT\s+INTO\s+("?[\w]+"?)\s*(?:\(([^)]*)\))?\s*VALUES\s*', re.IGNORECASE)
+VALUE_RE = re.compile(r"""\s*(?:E'((?:[^'\\]|\\.|'')*)'|'((?:[^']|'')*)'|(NULL)|(true|false)|([-+]?[\d.]+(?:[eE][-+]?\d+)?))(?:::[\w ]+)?\s*([,)])""",
+                      re.IGNORECASE | re.DOTALL)
+ESCAPE_RE = re.compile(r"\\(x[0-9A-Fa-f]{1,2}|[0-7]{1,3}|u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)", re.DOTALL)
+ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+# Statements of a pg_dump without SQLite equivalent that the snapshot does not
+# need (session settings, ownership, sequences, constraints and indexes, which
+# create_join_keys replaces). Every other statement has to succeed.
+POSTGRES_ONLY_RE = re.compile(r"""^\s*(?:
+    SET\b | SELECT\s+pg_catalog\. | COMMENT\s+ON\b | GRANT\b | REVOKE\b
+  | CREATE\s+(?:EXTENSION|SCHEMA|SEQUENCE)\b | CREATE\s+(?:UNIQUE\s+)?INDEX\b
+  | ALTER\s+(?:SEQUENCE|SCHEMA|DEFAULT\s+PRIVILEGES)\b
+  | ALTER\s+TABLE\b.*?\b(?:OWNER\s+TO|ADD\s+CONSTRAINT|ALTER\s+COLUMN)\b
+)""", re.IGNORECASE | re.VERBOSE | re.DOTALL)
+
+
+def split_statements(sql):
+    parts = []
+    strip_dot = False
+    for token in TOKEN_RE.finditer(sql):
+        kind, text = token.lastgroup, token.group()
+        if kind == "other":
+            raise ValueError(f"Unterminated literal or identifier at offset {token.start()}")
+        if kind == "end":
+            statement = "".join(parts).strip()
+            parts = []
+            if statement:
+                yield statement
+            continue
+
+        if kind == "comment":
+            text = " "
+        elif kind == "identifier" and text == '"public"':
+            # "public"."table" -> "table", SQLite has no schemas
+            strip_dot = True
+            continue
+        elif kind == "text":
+            if strip_dot and text.startswith("."):
+                text = text[1:]
+            text = SCHEMA_RE.sub("", text)
+        strip_dot = False
+        parts.append(text)
+
+    statement = "".join(parts).strip()
+    if statement:
+        yield statement
+
+def unescape(text):
+    # Backslash escapes of an E'...' string
+    def replace(match):
+        escape = match.group(1)
+        if escape[0] in "xuU" and len(escape) > 1:
+            return chr(int(escape[1:], 16))
+        if escape[0] in "01234567":
+            return chr(int(escape, 8))
+        return ESCAPES.get(escape, escape)
+    return ESCAPE_RE.sub(replace, text.replace("''", "'"))
+
+def parse_value(match):
+    escaped, text, null, boolean, number = match.group(1, 2, 3, 4, 5)
+    if escaped is not None:
+        return unescape(escaped)
+    if text is not None:
+        return text.replace("''", "'")
+    if null is not None:
+        return None
+    if boolean is not None:
+        return int(boolean.lower() == "true")
+    return float(number) if any(c in number for c in ".eE") else int(number)
+
+def parse_insert(statement):
+    match = INSERT_RE.match(statement)
+    if match is None:
+        return None
+
+    table = match.group(1).strip('"')
+    columns = tuple(c.strip().strip('"') for c in match.group(2).split(",")) if match.group(2) else None
+
+    rows = []
+    position = match.end()
+    while position < len(statement):
+        if statement[position] in " \t\r\n,":
+            position += 1
+            continue
+        if statement[position] != "(":
+            raise ValueError(f"Unexpected input in INSERT INTO {table} at offset {position}")
+        position += 1
+        row = []
+        while True:
+            value = VALUE_RE.match(statement, position)
+            if value is None:
+                raise ValueError(f"Unsupported value in INSERT INTO {table} at offset {position}")
+            row.append(parse_value(value))
+            position = value.end()
+            if value.group(6) == ")":
+                break
+        rows.append(tuple(row))
+
+    return table, columns, rows
+
+def build_snapshot(dump_paths, snapshot_path):
+    temp_path = snapshot_path + ".tmp"
+    if os.path.exists(temp_path):
+        os.unlink(temp_path)
+
+    conn = sqlite3.connect(temp_path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("BEGIN")
+
+        for dump_path in dump_paths:
+            with open(dump_path, encoding='utf-8') as file:
+                sql = file.read()
+
+            # Consecutive INSERTs into the same table are collected and written with one executemany
+            batch_key, batch_rows = None, []
+            for statement in split_statements(sql):
+                insert = parse_insert(statement)
+                if insert is None:
+                    if batch_rows:
+                        insert_rows(conn, batch_key, batch_rows)
+                        batch_key, batch_rows = None, []
+                    if POSTGRES_ONLY_RE.match(statement):
+                        logging.debug(f"Skipped Postgres specific statement in {dump_path}: {statement[:80]}")
+                        continue
+                    try:
+                        conn.execute(statement)
+                    except sqlite3.Error as e:
+                        raise ValueError(f"Statement in {dump_path} failed ({e}): {statement[:200]}") from e
+                    continue
+
+                table, columns, rows = insert
+                if (table, columns) != batch_key and batch_rows:
+                    insert_rows(conn, batch_key, batch_rows)
+                    batch_rows = []
+                batch_key = (table, columns)
+                batch_rows.extend(rows)
+
+            if batch_rows:
+                insert_rows(conn, batch_key, batch_rows)
+
+        create_join_keys(conn)
+        conn.execute("COMMIT")
+        conn.execute("PRAGMA journal_mode = DELETE")
+    except BaseException:
+        conn.close()
+        os.unlink(temp_path)
+        raise
+    conn.close()
+
+    os.replace(temp_path, snapshot_path)
+
+def insert_rows(conn, batch_key, rows):
+    table, columns = batch_key
+    placeholders = ", ".join("?" * len(rows[0]))
+    target = f'"{table}"'
+    if columns:
+        target += " (" + ", ".join(f'"{column}"' for column in columns) + ")"
+    try:
+        conn.executemany(f"INSERT INTO {target} VALUES ({placeholders})", rows)
+    except sqlite3.Error as e:
+        raise ValueError(f"INSERT INTO {table} failed ({e})") from e
+
+def create_join_keys(conn):
+    for table in RESULT_TABLES:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN join_key TEXT")
+        conn.execute(f"UPDATE {table} SET join_key = SUBSTR(primary_key, 3)")
+        conn.execute(f"CREATE INDEX idx_{table}_join_key ON {table} (join_key)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_main_table_primary_key ON main_table (primary_key)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_main_table_id_to_name ON main_table (id_to_name)")
+    conn.execute("ANALYZE")
+
+
+# Read-only connections to the snapshot, shared between the sessions of the app
+class SnapshotPool:
+    def __init__(self, snapshot_path=DEFAULT_SNAPSHOT_PATH, size=4):
+        if not snapshot_path or not os.path.exists(snapshot_path):
+            raise FileNotFoundError(f"Prior snapshot '{snapshot_path}' not found.")
+        self.path = snapshot_path
+        self._connections = queue.Queue()
+        for _ in range(size):
+            self._connections.put(sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True, check_same_thread=False))
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def query(self, sql, parameters=()):
+        with self.connection() as conn:
+            cursor = conn.execute(sql, parameters)
+            columns = [description[0] for description in cursor.description]
+            return columns, cursor.fetchall()
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+
+def load_celltypes(pool):
+    _, rows = pool.query("""
+        SELECT DISTINCT a.id_to_name
+        FROM disp_fun_estimation_results AS d
+        JOIN main_table AS a
+        ON d.join_key = a.primary_key""")
+    return [row[0] for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline SQLite snapshot of the prior database.")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_PATH or "priors.sqlite")
+    parser.add_argument("--dump", action="append", help="SQL dump file, can be given multiple times")
+    args = parser.parse_args()
+
+    dumps = args.dump or [os.environ[name] for name in ("MAIN_TABLE_SQLITE", "DISP_FUN_SQLITE", "GAMMA_LINEAR_FITS_SQLITE")
+                          if os.environ.get(name)]
+    if not dumps:
+        parser.error("No SQL dumps given (use --dump or set MAIN_TABLE_SQLITE, DISP_FUN_SQLITE and GAMMA_LINEAR_FITS_SQLITE).")
+
+    build_snapshot(dumps, args.snapshot)
+    pool = SnapshotPool(args.snapshot, size=1)
+    print(f"Built prior snapshot '{args.snapshot}' with {len(load_celltypes(pool))} cell types")
+    pool.close()
+
+if __name__ == "__main__":
+    main()
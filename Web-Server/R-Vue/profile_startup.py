@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Import-time profile of the Streamlit entry point.
+
+Runs ``python -X importtime -c "import app"`` in a fresh interpreter, prints
+the slowest imports and checks the result against a startup budget:
+
+    python profile_startup.py --budget-ms 1500 --top 15
+
+Exits with status 1 if the budget is exceeded or if one of the heavy
+analysis dependencies is imported eagerly by ``app`` (modules that streamlit
+itself already imports are not counted).
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules that must only be loaded once the analysis page or a Drive fetch is used
+LAZY_MODULES = ["pandas", "numpy", "plotly", "googleapiclient", "google.oauth2", "analysis", "data_fetch"]
+
+
+def run_importtime(module="app"):
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    probe = f"import sys, {module}; print('\\n'.join(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", probe],
+                            capture_output=True, text=True, cwd=app_dir)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing '{module}' failed:\n{result.stderr}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+
+    return timings, result.stdout.split()
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of the Streamlit entry point.")
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Maximal total import time in milliseconds")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports shown in the report")
+    args = parser.parse_args()
+
+    timings, loaded_modules = run_importtime(args.module)
+    _, streamlit_modules = run_importtime("streamlit")
+
+    # Top-level entries carry no leading indentation in the importtime output,
+    # so summing their cumulative times gives the total import cost
+    total_ms = sum(cumulative for name, _, cumulative in timings if not name.startswith(" ")) / 1000
+
+    print(f"Import-time profile for '{args.module}' ({len(timings)} modules)")
+    print(f"{'cumulative [ms]':>16} {'self [ms]':>10}  module")
+    for name, self_us, cumulative_us in sorted(timings, key=lambda t: t[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:16.1f} {self_us / 1000:10.1f}  {name.strip()}")
+    print(f"\nTotal: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    eager = [m for m in LAZY_MODULES if m in loaded_modules and m not in streamlit_modules]
+    if eager:
+        print(f"Eagerly imported heavy modules: {', '.join(eager)}")
+    if eager or total_ms > args.budget_ms:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.subplots as sp
+
+# Advanced parameters that can be varied in the sensitivity mode:
+# argument name -> (label, slider minimum, slider maximum, default range, step)
+SENSITIVITY_PARAMETERS = {
+    "ct.freq": ("Cell Type Frequency", 0.0, 1.0, (0.05, 0.3), 0.05),
+    "sign.threshold": ("P-value", 0.0, 1.0, (0.01, 0.1), 0.01),
+    "mappingEfficiency": ("Mapping efficiency", 0.0, 1.0, (0.6, 0.95), 0.05),
+    "multipletRate": ("Multiplet Rate", 0.0, 5e-05, (4e-06, 1.2e-05), 1e-06),
+    "perc.indiv.expr": ("Fraction of individuals", 0.0, 1.0, (0.25, 0.75), 0.05),
+}
+
+
+# All variants are evaluated in a single collector run. Batch entry 0 is the
+# baseline with the unchanged parameters, every other entry overrides exactly
+# one parameter.
+def build_sensitivity_batch(parameter_ranges, steps):
+    batch = [{}]
+    variants = [(None, None)]
+    for name, (low, high) in parameter_ranges.items():
+        for value in np.linspace(low, high, steps):
+            value = float(value)
+            batch.append({name: value})
+            variants.append((name, value))
+    return batch, variants
+
+SUMMARY_COLUMNS = ["parameter", "value", "optimal_power", "sampleSize", "totalCells", "readDepth"]
+
+# Returns the optimal design of every variant and the variants without one
+# (failed in the collector or without any finite detection power)
+def summarize_sensitivity(data, variants):
+    df = pd.DataFrame(data)
+    if 'Detection.power' not in df.columns:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS), list(variants)
+    df['Detection.power'] = pd.to_numeric(df['Detection.power'], errors='coerce')
+    df = df.dropna(subset=['Detection.power'])
+
+    # The optimal design of every batch entry is its study with maximal power
+    optimal = df.loc[df.groupby('batch')['Detection.power'].idxmax()].set_index('batch')
+
+    rows = []
+    missing = []
+    for index, (name, value) in enumerate(variants):
+        if index not in optimal.index:
+            missing.append((name, value))
+            continue
+        design = optimal.loc[index]
+        rows.append({
+            "parameter": name,
+            "value": value,
+            "optimal_power": design['Detection.power'],
+            "sampleSize": design.get('sampleSize'),
+            "totalCells": design.get('totalCells'),
+            "readDepth": design.get('readDepth'),
+        })
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS), missing
+
+def variant_label(name, value):
+    if name is None:
+        return "Current setting"
+    return f"{SENSITIVITY_PARAMETERS[name][0]} = {value:.4g}"
+
+def create_sensitivity_line_plot(summary):
+    baseline = summary[summary['parameter'].isna()]
+    varied = summary.dropna(subset=['parameter'])
+    parameters = list(dict.fromkeys(varied['parameter']))
+    if not parameters:
+        return None
+
+    fig = sp.make_subplots(rows=1, cols=len(parameters), shared_yaxes=True,
+                           subplot_titles=[SENSITIVITY_PARAMETERS[name][0] for name in parameters])
+
+    for col, name in enumerate(parameters, start=1):
+        df_plot = varied[varied['parameter'] == name]
+        fig.add_trace(
+            go.Scatter(
+                x=df_plot['value'], y=df_plot['optimal_power'],
+                mode='lines+markers', name=SENSITIVITY_PARAMETERS[name][0], showlegend=False,
+                customdata=df_plot[['sampleSize', 'totalCells', 'readDepth']].to_numpy(),
+                hovertemplate="Value: %{x:.4g}<br>Optimal power: %{y:.3f}<br>Sample size: %{customdata[0]}<br>Cells per individuum: %{customdata[1]}<br>Read depth: %{customdata[2]}<extra></extra>"
+            ),
+            row=1, col=col
+        )
+        if not baseline.empty:
+            fig.add_hline(y=baseline['optimal_power'].iloc[0], line_dash="dot", row=1, col=col)
+
+    fig.update_layout(yaxis_title="Optimal detection power")
+
+    return fig
+
+def create_tornado_plot(summary):
+    baseline = summary[summary['parameter'].isna()]
+    varied = summary.dropna(subset=['parameter'])
+    if baseline.empty or varied.empty:
+        return None
+    baseline_power = baseline['optimal_power'].iloc[0]
+
+    # Parameters with the widest range of optimal power are shown on top
+    spread = varied.groupby('parameter')['optimal_power'].agg(['min', 'max'])
+    spread = spread.assign(width=spread['max'] - spread['min']).sort_values('width')
+    labels = [SENSITIVITY_PARAMETERS[name][0] for name in spread.index]
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        y=labels, x=spread['min'] - baseline_power, base=baseline_power,
+        orientation='h', name="Lowest optimal power",
+        hovertemplate="%{y}: %{base:.3f} %{x:+.3f}<extra></extra>"
+    ))
+    fig.add_trace(go.Bar(
+        y=labels, x=spread['max'] - baseline_power, base=baseline_power,
+        orientation='h', name="Highest optimal power",
+        hovertemplate="%{y}: %{base:.3f} %{x:+.3f}<extra></extra>"
+    ))
+    fig.add_vline(x=baseline_power, line_dash="dot")
+
+    fig.update_layout(
+        barmode='overlay',
+        xaxis_title="Optimal detection power",
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+    )
+
+    return fig